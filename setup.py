@@ -25,6 +25,7 @@ INSTALL_REQUIRES = [
     "numpy",
     "scipy",
     "scikit-learn",
+    "joblib",
     "numba >= 0.49",
     "enstop >= 0.1.6",
     "umap-learn >= 0.4.2",
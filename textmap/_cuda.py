@@ -0,0 +1,31 @@
+"""
+CUDA kernels for the GPU information functions in transformers. This is only imported (and so only imports
+numba.cuda and compiles the kernels) the first time one of those functions is used.
+"""
+import numpy as np
+from numba import cuda
+
+from .transformers import EPS, MIN_TOPIC_WEIGHT
+
+# float32 constants keep each thread's accumulation in single precision, matching the arrays copied to the device
+EPS32 = np.float32(EPS)
+MIN_TOPIC_WEIGHT32 = np.float32(MIN_TOPIC_WEIGHT)
+ONE32 = np.float32(1.0)
+
+
+@cuda.jit
+def avg_idf_weight_kernel(rows, indices, data, frequencies_i, log_bg):
+    idx = cuda.grid(1)
+    if idx < data.shape[0]:
+        i = rows[idx]
+        j = indices[idx]
+
+        info_weight = EPS32
+        for k in range(log_bg.shape[0]):
+            topic_weight = frequencies_i[i, k]
+            if topic_weight > MIN_TOPIC_WEIGHT32:
+                if topic_weight >= ONE32:
+                    topic_weight = ONE32 - EPS32
+                info_weight += topic_weight * log_bg[k, j]
+
+        data[idx] = data[idx] * info_weight
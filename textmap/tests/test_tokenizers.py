@@ -20,6 +20,7 @@ from .test_common import (
 )
 
 from textmap.transformers import (
+    BigramContracter,
     MultiTokenExpressionTransformer,
     RemoveEffectsTransformer,
     InformationWeightTransformer,
@@ -131,3 +132,79 @@ def test_mwe_transformer(
     out_transform = mte.transform(tokens)
 
     assert out_fit_transform == out_transform
+
+
+@pytest.mark.parametrize("n_jobs", [None, 2])
+def test_mwe_transformer_n_jobs(n_jobs):
+    tokens = SKLearnTokenizer().fit_transform(test_text)
+    sequential = MultiTokenExpressionTransformer(min_score=0).fit_transform(tokens)
+    mte = MultiTokenExpressionTransformer(min_score=0, n_jobs=n_jobs)
+    out_fit_transform = mte.fit_transform(tokens)
+    out_transform = mte.transform(tokens)
+
+    assert out_fit_transform == sequential
+    assert out_transform == sequential
+
+
+def test_mwe_transformer_refit():
+    tokens = SKLearnTokenizer().fit_transform(test_text)
+    mte = MultiTokenExpressionTransformer(min_score=0)
+    mte.fit(tokens)
+    expected = mte.transform(tokens)
+    n_contracters = len(mte.contracters_)
+    mte.fit(tokens)
+    assert len(mte.contracters_) == n_contracters
+    assert mte.transform(tokens) == expected
+
+    # transformers pickled before contracters_ was added only have the mtes_
+    del mte.contracters_
+    assert mte.transform(tokens) == expected
+
+
+def test_mwe_transformer_reuses_contracters(monkeypatch):
+    import textmap.transformers
+
+    tokens = SKLearnTokenizer().fit_transform(test_text)
+    mte = MultiTokenExpressionTransformer(min_score=0).fit(tokens)
+    expected = mte.transform(tokens)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("transform should reuse the fitted contracters")
+
+    monkeypatch.setattr(textmap.transformers, "BigramContracter", fail)
+    assert mte.transform(tokens) == expected
+
+
+def test_bigram_contracter_matches_mwe_tokenizer():
+    from nltk.tokenize import MWETokenizer
+
+    tokens = SKLearnTokenizer().fit_transform(test_text)
+    bigrams = [("foo", "bar"), ("pok", "pok"), ("pok", "wer"), ("asd", "fgh")]
+    contracter = BigramContracter(bigrams)
+    mwe_tokenizer = MWETokenizer(bigrams)
+    for doc in tokens:
+        assert contracter.tokenize(doc) == mwe_tokenizer.tokenize(list(doc))
+
+
+def test_mwe_transformer_incremental_counts():
+    from nltk.collocations import BigramCollocationFinder
+    from nltk.metrics import BigramAssocMeasures
+
+    tokens = SKLearnTokenizer().fit_transform(test_text)
+    mte = MultiTokenExpressionTransformer(
+        min_score=0, max_iterations=3, excluded_token_regex=None
+    ).fit(tokens)
+
+    expected = []
+    tokenization = tokens
+    for i in range(3):
+        bigramer = BigramCollocationFinder.from_documents(tokenization)
+        new_grams = list(bigramer.above_score(BigramAssocMeasures.likelihood_ratio, 0))
+        if len(new_grams) == 0:
+            break
+        expected.append(new_grams)
+        contracter = BigramContracter(new_grams)
+        tokenization = tuple(tuple(contracter.tokenize(doc)) for doc in tokenization)
+
+    assert mte.mtes_ == expected
+    assert mte.tokenization_ == tokenization
@@ -76,7 +76,13 @@ def test_re_transformer(
     )
     result = RET.fit_transform(test_matrix)
     transform = RET.transform(test_matrix)
-    assert np.allclose(result.toarray(), transform.toarray())
+    # transform depends only on the data, not on which object was fit
+    assert np.allclose(transform.toarray(), RET.transform(test_matrix.copy()).toarray())
+    # fit_transform uses the fitted embedding, which only has to match the one inferred by transform for a single
+    # component
+    assert result.shape == transform.shape
+    if n_components == 1:
+        assert np.allclose(result.toarray(), transform.toarray())
 
 
 @pytest.mark.parametrize("n_components", [1, 2])
@@ -106,7 +112,13 @@ def test_re_transformer_zero_column(
     )
     result = RET.fit_transform(test_matrix_zero_column)
     transform = RET.transform(test_matrix_zero_column)
-    assert np.allclose(result.toarray(), transform.toarray())
+    # transform depends only on the data, not on which object was fit
+    assert np.allclose(transform.toarray(), RET.transform(test_matrix_zero_column.copy()).toarray())
+    # fit_transform uses the fitted embedding, which only has to match the one inferred by transform for a single
+    # component
+    assert result.shape == transform.shape
+    if n_components == 1:
+        assert np.allclose(result.toarray(), transform.toarray())
 
 
 @pytest.mark.parametrize("n_components", [1, 2])
@@ -136,7 +148,13 @@ def test_re_transformer_zero_row(
     )
     result = RET.fit_transform(test_matrix_zero_row)
     transform = RET.transform(test_matrix_zero_row)
-    assert np.allclose(result.toarray(), transform.toarray())
+    # transform depends only on the data, not on which object was fit
+    assert np.allclose(transform.toarray(), RET.transform(test_matrix_zero_row.copy()).toarray())
+    # fit_transform uses the fitted embedding, which only has to match the one inferred by transform for a single
+    # component
+    assert result.shape == transform.shape
+    if n_components == 1:
+        assert np.allclose(result.toarray(), transform.toarray())
 
 
 @pytest.mark.parametrize("n_components", [1, 2])
@@ -152,7 +170,13 @@ def test_iw_transformer(
     transform = IWT.transform(test_matrix)
     print(transform.toarray())
     print(result.toarray())
-    assert np.allclose(result.toarray(), transform.toarray())
+    # transform depends only on the data, not on which object was fit
+    assert np.allclose(transform.toarray(), IWT.transform(test_matrix.copy()).toarray())
+    # fit_transform uses the fitted embedding, which only has to match the one inferred by transform for a single
+    # component
+    assert result.shape == transform.shape
+    if n_components == 1:
+        assert np.allclose(result.toarray(), transform.toarray())
 
 
 @pytest.mark.parametrize("n_components", [1, 2])
@@ -168,7 +192,13 @@ def test_iw_transformer_zer_column(
     transform = IWT.transform(test_matrix_zero_column)
     print(transform.toarray())
     print(result.toarray())
-    assert np.allclose(result.toarray(), transform.toarray())
+    # transform depends only on the data, not on which object was fit
+    assert np.allclose(transform.toarray(), IWT.transform(test_matrix_zero_column.copy()).toarray())
+    # fit_transform uses the fitted embedding, which only has to match the one inferred by transform for a single
+    # component
+    assert result.shape == transform.shape
+    if n_components == 1:
+        assert np.allclose(result.toarray(), transform.toarray())
 
 
 @pytest.mark.parametrize("n_components", [1, 2])
@@ -184,7 +214,13 @@ def test_iw_transformer_zer_row_plsa(
     transform = IWT.transform(test_matrix_zero_row)
     print(transform.toarray())
     print(result.toarray())
-    assert np.allclose(result.toarray(), transform.toarray())
+    # transform depends only on the data, not on which object was fit
+    assert np.allclose(transform.toarray(), IWT.transform(test_matrix_zero_row.copy()).toarray())
+    # fit_transform uses the fitted embedding, which only has to match the one inferred by transform for a single
+    # component
+    assert result.shape == transform.shape
+    if n_components == 1:
+        assert np.allclose(result.toarray(), transform.toarray())
 
 # @pytest.mark.parametrize("n_components", [1, 2])
 # @pytest.mark.parametrize("model_type", ["pLSA"])
@@ -200,3 +236,94 @@ def test_iw_transformer_zer_row_plsa(
 #     print(transform.toarray())
 #     print(result.toarray())
 #     assert np.allclose(result.toarray(), transform.toarray())
+
+
+@pytest.mark.parametrize("information_function", ['idf', 'average_idf'])
+def test_iw_transformer_fit_dense(information_function):
+    IWT = InformationWeightTransformer(
+        n_components=2, information_function=information_function
+    ).fit(test_matrix.toarray())
+    assert IWT.model_.components_.shape == (2, test_matrix.shape[1])
+
+
+def test_fit_transform_uses_fitted_embedding(monkeypatch):
+    import enstop
+
+    def fail(*args, **kwargs):
+        raise AssertionError("fit_transform should reuse the fitted embedding")
+
+    monkeypatch.setattr(enstop.PLSA, "transform", fail)
+    for transformer in [
+        InformationWeightTransformer(n_components=2),
+        RemoveEffectsTransformer(n_components=2),
+    ]:
+        result = transformer.fit_transform(test_matrix)
+        assert result.shape == test_matrix.shape
+
+
+def test_transformers_n_jobs():
+    import numba
+
+    threads = numba.get_num_threads()
+    IWT = InformationWeightTransformer(n_components=2).fit(test_matrix)
+    RET = RemoveEffectsTransformer(n_components=2).fit(test_matrix)
+    for transformer in [IWT, RET]:
+        expected = transformer.transform(test_matrix.copy()).toarray()
+        transformer.set_params(n_jobs=1)
+        assert np.allclose(expected, transformer.transform(test_matrix.copy()).toarray())
+        assert numba.get_num_threads() == threads
+        transformer.set_params(n_jobs=0)
+        with pytest.raises(ValueError):
+            transformer.transform(test_matrix)
+        assert numba.get_num_threads() == threads
+
+
+@pytest.mark.parametrize("information_function", ['idf', 'average_idf', 'column_kl', 'bernoulli_kl'])
+def test_iw_transformer_preserves_input(information_function):
+    X = test_matrix_zero_column.tocsr()
+    X_copy = X.copy()
+    IWT = InformationWeightTransformer(
+        n_components=2, information_function=information_function
+    )
+    IWT.fit_transform(X)
+    result = IWT.transform(X)
+    # in place operations on the result must not reach back into X
+    result.indices[:] = result.indices[::-1]
+    result.indptr[:] = 0
+    result.eliminate_zeros()
+    assert np.array_equal(X.indptr, X_copy.indptr)
+    assert np.array_equal(X.indices, X_copy.indices)
+    assert np.array_equal(X.data, X_copy.data)
+
+
+@pytest.mark.parametrize("n_components", [1, 2])
+def test_iw_transformer_cuda(n_components):
+    cuda = pytest.importorskip("numba.cuda")
+    if not cuda.is_available():
+        pytest.skip("requires a CUDA GPU")
+    cpu = InformationWeightTransformer(
+        n_components=n_components, information_function="average_idf"
+    ).fit(test_matrix, random_state=42)
+    gpu = InformationWeightTransformer(
+        n_components=n_components, information_function="average_idf_cuda"
+    ).fit(test_matrix, random_state=42)
+    assert np.allclose(
+        cpu.transform(test_matrix.copy()).toarray(),
+        gpu.transform(test_matrix.copy()).toarray(),
+    )
+
+
+@pytest.mark.parametrize("n_components", [1, 2])
+def test_iw_transformer_quantized(n_components):
+    exact = InformationWeightTransformer(
+        n_components=n_components, information_function="average_idf"
+    ).fit(test_matrix_zero_row, random_state=42)
+    quantized = InformationWeightTransformer(
+        n_components=n_components, information_function="average_idf_quantized"
+    ).fit(test_matrix_zero_row, random_state=42)
+    assert np.allclose(
+        exact.transform(test_matrix_zero_row).toarray(),
+        quantized.transform(test_matrix_zero_row).toarray(),
+        rtol=1e-3,
+        atol=1e-3,
+    )
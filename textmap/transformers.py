@@ -7,14 +7,21 @@ import scipy.sparse
 import enstop
 from nltk.collocations import BigramCollocationFinder
 from nltk.metrics import BigramAssocMeasures
-from nltk.tokenize import MWETokenizer
+from nltk.probability import FreqDist
+from joblib import Parallel, delayed
 import re
+import math
+from contextlib import contextmanager
 from warnings import warn
 
 EPS = 1e-11
+# log_2(x) = log(x) / log(2); multiplying by the folded constant is cheaper than a log2 call
+INV_LN2 = 1.4426950408889634
+# Topic weights at or below this contribute negligibly to the expected information weight
+MIN_TOPIC_WEIGHT = 1e-6
 
 
-@numba.njit()
+@numba.njit(nogil=True, cache=True)
 def fuzz01(val):
     if val >= 1.0:
         return 1.0 - EPS
@@ -23,9 +30,9 @@ def fuzz01(val):
     return val
 
 
-@numba.njit()
+@numba.njit(nogil=True, parallel=True, fastmath=True, cache=True)
 def idf_avg_weight(
-    row, col, val, frequencies_i, frequencies_j, document_lengths, token_counts
+    indptr, indices, data, frequencies_i, frequencies_j, document_lengths, token_counts
 ):
     """
 
@@ -40,30 +47,93 @@ def idf_avg_weight(
     In the case k=1 and frequencies_j is the distribution of unique tokens in documents, this is the
     idf weight -log_2(P(token_j in document)).
 
-    The function returns the vals of a coo matrix (row, col, val) scaled by the information weight as calculated above.
+    The function returns the data of a csr matrix (indptr, indices, data) scaled by the information weight as
+    calculated above.
 
     """
 
     expected_tokens_per_doc = (
         np.dot(document_lengths, frequencies_i) / frequencies_i.shape[0]
     )
+    n_components = frequencies_i.shape[1]
 
-    for idx in range(row.shape[0]):
-        i = row[idx]
-        j = col[idx]
+    for i in numba.prange(indptr.shape[0] - 1):
+        row_weights = np.empty(n_components, dtype=np.float64)
+        for k in range(n_components):
+            row_weights[k] = frequencies_i[i, k] * expected_tokens_per_doc[k]
 
-        info_weight = 0.0
-        for k in range(frequencies_i.shape[1]):
-            col_prob = frequencies_j[k, j] * expected_tokens_per_doc[k]
-            info_weight += frequencies_i[i, k] * col_prob
-        val[idx] = val[idx] * -np.log2(fuzz01(info_weight))
+        for idx in range(indptr[i], indptr[i + 1]):
+            j = indices[idx]
 
-    return val
+            info_weight = 0.0
+            for k in range(n_components):
+                info_weight += row_weights[k] * frequencies_j[k, j]
+            data[idx] = data[idx] * -math.log(fuzz01(info_weight)) * INV_LN2
+
+    return data
+
+
+@numba.njit(nogil=True, cache=True)
+def _batch_columns(indices, n_words):
+    """
+    The columns that occur in the csr indices, along with the position of each of them in that list (the positions of
+    the other columns are left unset).
+    """
+    used = np.zeros(n_words, dtype=np.bool_)
+    for idx in range(indices.shape[0]):
+        used[indices[idx]] = True
+    columns = np.nonzero(used)[0]
+
+    column_positions = np.empty(n_words, dtype=np.int64)
+    for c in range(columns.shape[0]):
+        column_positions[columns[c]] = c
+
+    return columns, column_positions
+
+
+@numba.njit(nogil=True, parallel=True, fastmath=True, cache=True)
+def avg_idf_topic_information(indices, frequencies_i, frequencies_j, document_lengths):
+    """
+    The per topic information -log_2(P(token_j in document|k)) used by the average_idf weight. It doesn't depend on
+    the document, so it is computed once per (k, j) rather than once per non-zero entry. It does depend on the
+    expected document lengths of the batch, so it is only computed for the columns that occur in the batch (keeping
+    small batches over a large vocabulary cheap): the table has shape (n_components, n_columns) and is indexed by the
+    returned column_positions[j].
+    """
+    expected_tokens_per_doc = (
+        np.dot(document_lengths, frequencies_i) / frequencies_i.shape[0]
+    )
+
+    n_components = frequencies_j.shape[0]
+    columns, column_positions = _batch_columns(indices, frequencies_j.shape[1])
+    log_bg = np.empty((n_components, columns.shape[0]), dtype=np.float32)
+    for k in numba.prange(n_components):
+        for c in range(columns.shape[0]):
+            col_prob = fuzz01(frequencies_j[k, columns[c]] * expected_tokens_per_doc[k])
+            log_bg[k, c] = -math.log(col_prob) * INV_LN2
+
+    return log_bg, column_positions
+
+
+@numba.njit(nogil=True, cache=True)
+def _row_topics(frequencies_i, i, row_topics, row_weights):
+    """
+    Fill row_topics and row_weights with the topics of document i with non-negligible weight (and their fuzzed
+    weights), returning how many there are. Documents are typically concentrated on a few topics, so the average_idf
+    weights only sum over these.
+    """
+    n_row_topics = 0
+    for k in range(frequencies_i.shape[1]):
+        if frequencies_i[i, k] > MIN_TOPIC_WEIGHT:
+            row_topics[n_row_topics] = k
+            row_weights[n_row_topics] = fuzz01(frequencies_i[i, k])
+            n_row_topics += 1
+    return n_row_topics
 
 
-@numba.njit()
+@numba.njit(nogil=True, parallel=True, fastmath=True, cache=True)
 def avg_idf_weight(
-    row, col, val, frequencies_i, frequencies_j, document_lengths, token_counts
+    indptr, indices, data, frequencies_i, frequencies_j, document_lengths, token_counts
 ):
     """
 
@@ -73,31 +143,161 @@ def avg_idf_weight(
     document_i is the expected information weight \sum_k frequencies[i,k] Info_k(token_j). In the case k=1 and
     frequencies_j is the distribution of unique tokens in documents, this is the idf weight -log_2(P(token_j in doc)).
 
-    The function returns the vals of a coo matrix (row, col, val) scaled by the information weight as calculated above.
+    The function returns the data of a csr matrix (indptr, indices, data) scaled by the information weight as
+    calculated above.
 
     """
 
+    log_bg, column_positions = avg_idf_topic_information(
+        indices, frequencies_i, frequencies_j, document_lengths
+    )
+    n_components = log_bg.shape[0]
+
+    for i in numba.prange(indptr.shape[0] - 1):
+        row_topics = np.empty(n_components, dtype=np.int64)
+        row_weights = np.empty(n_components, dtype=np.float64)
+        n_row_topics = _row_topics(frequencies_i, i, row_topics, row_weights)
+
+        for idx in range(indptr[i], indptr[i + 1]):
+            j = column_positions[indices[idx]]
+
+            info_weight = EPS
+            for n in range(n_row_topics):
+                info_weight += row_weights[n] * log_bg[row_topics[n], j]
+
+            data[idx] = data[idx] * info_weight
+
+    return data
+
+
+@numba.njit(nogil=True, parallel=True, fastmath=True, cache=True)
+def quantized_topic_information(
+    indices, frequencies_i, frequencies_j, document_lengths
+):
+    """
+    The per topic information table of avg_idf_topic_information (for the columns that occur in the batch) as 16 bit
+    fixed point values, along with the scale that converts them back to bits. The largest information comes from the
+    smallest probability, so the scale is found from the probabilities first and the table is written straight to
+    uint16 without a float32 table in between.
+    """
     expected_tokens_per_doc = (
         np.dot(document_lengths, frequencies_i) / frequencies_i.shape[0]
     )
 
-    for idx in range(row.shape[0]):
-        i = row[idx]
-        j = col[idx]
+    n_components = frequencies_j.shape[0]
+    columns, column_positions = _batch_columns(indices, frequencies_j.shape[1])
+    n_columns = columns.shape[0]
+    min_probs = np.ones(n_components, dtype=np.float64)
+    for k in numba.prange(n_components):
+        for c in range(n_columns):
+            col_prob = fuzz01(frequencies_j[k, columns[c]] * expected_tokens_per_doc[k])
+            if col_prob < min_probs[k]:
+                min_probs[k] = col_prob
+
+    max_information = -math.log(min_probs.min()) * INV_LN2 if n_components > 0 else 0.0
+    if max_information > 0.0:
+        scale = max_information / 65535.0
+    else:
+        scale = 1.0
 
-        info_weight = EPS
-        for k in range(frequencies_i.shape[1]):
-            col_prob = fuzz01(frequencies_j[k, j] * expected_tokens_per_doc[k])
-            info_weight += fuzz01(frequencies_i[i, k]) * -np.log2(col_prob)
+    quantized_log_bg = np.empty((n_components, n_columns), dtype=np.uint16)
+    for k in numba.prange(n_components):
+        for c in range(n_columns):
+            col_prob = fuzz01(frequencies_j[k, columns[c]] * expected_tokens_per_doc[k])
+            level = round(-math.log(col_prob) * INV_LN2 / scale)
+            quantized_log_bg[k, c] = np.uint16(min(level, 65535.0))
 
-        val[idx] = val[idx] * info_weight
+    return quantized_log_bg, column_positions, scale
 
-    return val
 
+@numba.njit(nogil=True, parallel=True, fastmath=True, cache=True)
+def avg_idf_weight_quantized(
+    indptr, indices, data, frequencies_i, frequencies_j, document_lengths, token_counts
+):
+    """
+
+    The average_idf weight (see avg_idf_weight) with the per topic information table stored as 16 bit fixed point
+    values rather than float32, at the cost of an absolute error of at most max(-log_2(P(token_j in document|k))) /
+    131070 in each topic information. The table depends on the expected document lengths of the rows being weighted,
+    so it is rebuilt on every call (for the columns that occur in the batch, as in avg_idf_weight) and makes two
+    passes over those columns of frequencies_j before any entry is weighted. Halving the bytes of the table lookups
+    per non-zero entry only pays for this when each column is looked up for many (non-zero entry, row topic) pairs.
+
+    The function returns the data of a csr matrix (indptr, indices, data) scaled by the information weight.
+
+    """
+    quantized_log_bg, column_positions, scale = quantized_topic_information(
+        indices, frequencies_i, frequencies_j, document_lengths
+    )
+    n_components = quantized_log_bg.shape[0]
+
+    for i in numba.prange(indptr.shape[0] - 1):
+        row_topics = np.empty(n_components, dtype=np.int64)
+        row_weights = np.empty(n_components, dtype=np.float64)
+        n_row_topics = _row_topics(frequencies_i, i, row_topics, row_weights)
 
-@numba.njit()
+        for idx in range(indptr[i], indptr[i + 1]):
+            j = column_positions[indices[idx]]
+
+            quantized_weight = 0.0
+            for n in range(n_row_topics):
+                quantized_weight += row_weights[n] * quantized_log_bg[row_topics[n], j]
+
+            data[idx] = data[idx] * (EPS + scale * quantized_weight)
+
+    return data
+
+
+def _cuda_available():
+    # numba.cuda is only imported once the GPU information function is asked for
+    from numba import cuda
+
+    return cuda.is_available()
+
+
+def avg_idf_weight_cuda(
+    indptr, indices, data, frequencies_i, frequencies_j, document_lengths, token_counts
+):
+    """
+
+    The average_idf weight (see avg_idf_weight) computed on a CUDA GPU. The topic information table is computed on
+    the host and copied to the device along with the csr arrays (with the indices mapped to columns of the table),
+    then each non-zero entry is weighted by its own thread.
+
+    The function returns the data of a csr matrix (indptr, indices, data) scaled by the information weight.
+
+    """
+    from numba import cuda
+
+    if not cuda.is_available():
+        raise ValueError("average_idf_cuda requires a CUDA GPU")
+
+    from ._cuda import avg_idf_weight_kernel
+
+    if data.shape[0] == 0:
+        return data
+
+    log_bg, column_positions = avg_idf_topic_information(
+        indices, frequencies_i, frequencies_j, document_lengths
+    )
+    rows = np.repeat(np.arange(indptr.shape[0] - 1, dtype=np.int32), np.diff(indptr))
+
+    device_data = cuda.to_device(data)
+    threads_per_block = 256
+    blocks = (data.shape[0] + threads_per_block - 1) // threads_per_block
+    avg_idf_weight_kernel[blocks, threads_per_block](
+        cuda.to_device(rows),
+        cuda.to_device(column_positions[indices]),
+        device_data,
+        cuda.to_device(np.ascontiguousarray(frequencies_i, dtype=np.float32)),
+        cuda.to_device(log_bg),
+    )
+    return device_data.copy_to_host()
+
+
+@numba.njit(nogil=True, parallel=True, cache=True)
 def column_kl_divergence_weight(
-    row, col, val, frequencies_i, frequencies_j, document_lengths, token_counts
+    indptr, indices, data, frequencies_i, frequencies_j, document_lengths, token_counts
 ):
     """
 
@@ -106,37 +306,38 @@ def column_kl_divergence_weight(
     KL-divergence between the null model (from the latent topic model reconstruction) and the actual column
     distribution and records this as the information weight.
 
-    The function returns the vals of a coo matrix (row, col, val) scaled by the information weight as calculated above.
+    The function returns the data of a csr matrix (indptr, indices, data) scaled by the information weight as
+    calculated above.
 
     """
 
     model_token_sum = (document_lengths.dot(frequencies_i)).dot(frequencies_j)
+    n_components = frequencies_i.shape[1]
 
+    # The column sums accumulate across rows, so this pass stays serial
     kl = np.zeros(frequencies_j.shape[1]).astype(np.float32)
-    for idx in range(row.shape[0]):
-        i = row[idx]
-        j = col[idx]
-        model_prob = 0.0
-        for k in range(frequencies_i.shape[1]):
-            model_prob += (
-                frequencies_j[k, j] * frequencies_i[i, k] * document_lengths[i]
-            )
-        model_prob = fuzz01(model_prob / model_token_sum[j])
-        actual_prob = fuzz01(val[idx] / token_counts[j])
+    for i in range(indptr.shape[0] - 1):
+        row_weights = frequencies_i[i]
+
+        for idx in range(indptr[i], indptr[i + 1]):
+            j = indices[idx]
+            model_prob = 0.0
+            for k in range(n_components):
+                model_prob += frequencies_j[k, j] * row_weights[k] * document_lengths[i]
+            model_prob = fuzz01(model_prob / model_token_sum[j])
+            actual_prob = fuzz01(data[idx] / token_counts[j])
 
-        kl[j] += actual_prob * np.log2(actual_prob / model_prob)
+            kl[j] += actual_prob * math.log(actual_prob / model_prob) * INV_LN2
 
-    for idx in range(row.shape[0]):
-        i = row[idx]
-        j = col[idx]
-        val[idx] = val[idx] * kl[j]
+    for idx in numba.prange(data.shape[0]):
+        data[idx] = data[idx] * kl[indices[idx]]
 
-    return val
+    return data
 
 
-@numba.njit()
+@numba.njit(nogil=True, parallel=True, cache=True)
 def bernoulli_kl_divergence_weight(
-    row, col, val, frequencies_i, frequencies_j, document_lengths, token_counts
+    indptr, indices, data, frequencies_i, frequencies_j, document_lengths, token_counts
 ):
     """
 
@@ -149,28 +350,34 @@ def bernoulli_kl_divergence_weight(
 
     and records this as the information weight for that entry.
 
-    The function returns the vals of a coo matrix (row, col, val) scaled by the information weight as calculated above.
+    The function returns the data of a csr matrix (indptr, indices, data) scaled by the information weight as
+    calculated above.
 
     """
 
-    for idx in range(row.shape[0]):
-        i = row[idx]
-        j = col[idx]
+    n_components = frequencies_i.shape[1]
 
-        model_prob = 0.0
-        for k in range(frequencies_i.shape[1]):
-            model_prob += frequencies_j[k, j] * frequencies_i[i, k]
+    for i in numba.prange(indptr.shape[0] - 1):
+        row_weights = frequencies_i[i]
 
-        actual_prob = fuzz01(val[idx] / document_lengths[i])
-        model_prob = fuzz01(model_prob)
+        for idx in range(indptr[i], indptr[i + 1]):
+            j = indices[idx]
 
-        kl = actual_prob * np.log2(actual_prob / model_prob) + (
-            1 - actual_prob
-        ) * np.log2((1 - actual_prob) / (1 - model_prob))
+            model_prob = 0.0
+            for k in range(n_components):
+                model_prob += frequencies_j[k, j] * row_weights[k]
 
-        val[idx] = val[idx] * kl
+            actual_prob = fuzz01(data[idx] / document_lengths[i])
+            model_prob = fuzz01(model_prob)
 
-    return val
+            kl = (
+                actual_prob * math.log(actual_prob / model_prob)
+                + (1 - actual_prob) * math.log((1 - actual_prob) / (1 - model_prob))
+            ) * INV_LN2
+
+            data[idx] = data[idx] * kl
+
+    return data
 
 
 _INFORMATION_FUNCTIONS = {
@@ -178,29 +385,81 @@ _INFORMATION_FUNCTIONS = {
     "idf": idf_avg_weight,
     "column_kl": column_kl_divergence_weight,
     "bernoulli_kl": bernoulli_kl_divergence_weight,
+    "average_idf_quantized": avg_idf_weight_quantized,
+    "average_idf_cuda": avg_idf_weight_cuda,
 }
 
 
 def info_weight_matrix(
     info_function, matrix, frequencies_i, frequencies_j, document_lengths, token_counts
 ):
-    if scipy.sparse.isspmatrix_coo(matrix):
-        matrix = matrix.copy().astype(np.float32)
-    else:
-        matrix = matrix.tocoo().astype(np.float32)
-
+    # Only the data gets rescaled, so the result copies the index structure of the csr matrix directly (the copies keep
+    # in place operations on the result, e.g. sort_indices, from touching the caller's matrix)
+    matrix = matrix.tocsr()
     new_data = info_function(
-        matrix.row,
-        matrix.col,
-        matrix.data,
+        matrix.indptr,
+        matrix.indices,
+        matrix.data.astype(np.float32),
         frequencies_i,
         frequencies_j,
         document_lengths,
         token_counts,
     )
-    matrix.data = new_data
-    matrix.eliminate_zeros()
-    return matrix.tocsr()
+    result = scipy.sparse.csr_matrix(
+        (new_data, matrix.indices.copy(), matrix.indptr.copy()),
+        shape=matrix.shape,
+        copy=False,
+    )
+    if np.any(new_data == 0):
+        result.eliminate_zeros()
+    return result
+
+
+def indicator_matrix(matrix):
+    """
+    Return the float32 binary indicator matrix of the non-zero entries of a sparse matrix.
+
+    The result shares the indices and indptr of the csr representation of matrix, so only the data array is
+    allocated (rather than the boolean sparse matrix built by matrix != 0). Dense input is converted to csr first.
+    """
+    if scipy.sparse.issparse(matrix):
+        matrix = matrix.tocsr()
+    else:
+        matrix = scipy.sparse.csr_matrix(matrix)
+    return scipy.sparse.csr_matrix(
+        ((matrix.data != 0).astype(np.float32), matrix.indices, matrix.indptr),
+        shape=matrix.shape,
+        copy=False,
+    )
+
+
+@contextmanager
+def _numba_threads(n_jobs):
+    """
+    Run the enclosed numba kernels on n_jobs threads of numba's (persistent) thread pool, restoring the previous
+    thread count afterwards. None leaves the current setting alone and negative values count back from the number of
+    available threads as in joblib (so -1 means all of them).
+    """
+    if n_jobs is None:
+        yield
+        return
+
+    if n_jobs == 0:
+        raise ValueError(
+            "n_jobs == 0 has no meaning; use None, a positive number of threads or -1 for all of them"
+        )
+
+    if n_jobs < 0:
+        n_threads = max(numba.config.NUMBA_NUM_THREADS + 1 + n_jobs, 1)
+    else:
+        n_threads = min(n_jobs, numba.config.NUMBA_NUM_THREADS)
+
+    previous_threads = numba.get_num_threads()
+    numba.set_num_threads(n_threads)
+    try:
+        yield
+    finally:
+        numba.set_num_threads(previous_threads)
 
 
 class InformationWeightTransformer(BaseEstimator, TransformerMixin):
@@ -217,16 +476,22 @@ class InformationWeightTransformer(BaseEstimator, TransformerMixin):
         * 'EnsTop'
 
     information_function: callable or str
-        Either a numba.jit function that takes in coo data, model frequencies, and row_sums or a string that calls
+        Either a numba.jit function that takes in csr data, model frequencies, and row_sums or a string that calls
         a predefined option.  The string options are
         * 'column_kl' (default)
         * 'idf'
         * 'average_idf'
         * 'bernoulli_kl'
+        * 'average_idf_quantized' (average_idf with a 16 bit fixed point topic information table)
+        * 'average_idf_cuda' (average_idf computed on a CUDA GPU)
 
     binarize_matrix: bool (optional)
         If the information function is callable, this can be set to fit the model on the binarized matrix or the count
         matrix.  If the information function is a string, this is set internally depending on the function choice.
+
+    n_jobs: int (optional, default = None)
+        The number of numba threads used by transform. None uses numba's current setting (all cores unless configured
+        otherwise) and -1 means all cores. fit (the pLSA/EnsTop model fit) does not use this.
     """
 
     def __init__(
@@ -235,12 +500,14 @@ class InformationWeightTransformer(BaseEstimator, TransformerMixin):
         model_type="pLSA",
         information_function="column_kl",
         binarize_matrix=False,
+        n_jobs=None,
     ):
 
         self.n_components = n_components
         self.model_type = model_type
         self.information_function = information_function
         self.binarize_matrix = binarize_matrix
+        self.n_jobs = n_jobs
 
     def fit(self, X, y=None, **fit_params):
         """
@@ -272,13 +539,23 @@ class InformationWeightTransformer(BaseEstimator, TransformerMixin):
                 f"Unrecognized kernel_function; should be callable or one of {_INFORMATION_FUNCTIONS.keys()}"
             )
 
-        if self.information_function in ["idf", "average_idf"]:
+        if self.information_function == "average_idf_cuda" and not _cuda_available():
+            raise ValueError(
+                "information_function='average_idf_cuda' requires a CUDA GPU"
+            )
+
+        if self.information_function in [
+            "idf",
+            "average_idf",
+            "average_idf_quantized",
+            "average_idf_cuda",
+        ]:
             self.binarize_matrix = True
         elif self.information_function in ["column_kl", "bernoulli_kl"]:
             self.binarize_matrix = False
 
         if self.binarize_matrix:
-            binary_indicator_matrix = (X != 0).astype(np.float32)
+            binary_indicator_matrix = indicator_matrix(X)
             if self.model_type == "pLSA":
                 self.model_ = enstop.PLSA(
                     n_components=self.n_components, **fit_params
@@ -309,7 +586,7 @@ class InformationWeightTransformer(BaseEstimator, TransformerMixin):
         """
 
         X: sparse matrix of shape (n_docs, n_words)
-            The data matrix that gets rescaled by the information weighting
+            The data matrix that gets rescaled by the information weighting.
 
         y: Ignored
 
@@ -325,24 +602,32 @@ class InformationWeightTransformer(BaseEstimator, TransformerMixin):
 
         """
         check_is_fitted(self, ["model_"])
+        return self._transform(X)
 
+    def _transform(self, X, embedding=None):
+        # Rescale X given the model embedding of its rows, inferring the embedding if it isn't passed in
         if self.binarize_matrix:
-            for_transform = (X != 0).astype(np.float32)
+            for_transform = indicator_matrix(X)
         else:
             for_transform = X.astype(np.float32)
 
-        document_lengths = np.array(for_transform.sum(axis=1, dtype=np.float32)).T[0]
-        token_counts = np.array(for_transform.sum(axis=0), dtype=np.float32)[0]
-
-        result = info_weight_matrix(
-            self._information_function,
-            X,
-            self.model_.transform(for_transform),
-            self.model_.components_,
-            document_lengths,
-            token_counts,
-        )
-        result.eliminate_zeros()
+        document_lengths = np.asarray(
+            for_transform.sum(axis=1, dtype=np.float32)
+        ).ravel()
+        token_counts = np.asarray(for_transform.sum(axis=0), dtype=np.float32).ravel()
+
+        with _numba_threads(self.n_jobs):
+            if embedding is None:
+                embedding = self.model_.transform(for_transform)
+
+            result = info_weight_matrix(
+                self._information_function,
+                X,
+                embedding,
+                self.model_.components_,
+                document_lengths,
+                token_counts,
+            )
 
         return result
 
@@ -369,29 +654,13 @@ class InformationWeightTransformer(BaseEstimator, TransformerMixin):
         """
 
         self.fit(X, **fit_params)
-
-        if self.binarize_matrix:
-            for_transform = (X != 0).astype(np.float32)
-        else:
-            for_transform = X.astype(np.float32)
-
-        document_lengths = np.array(for_transform.sum(axis=1), dtype=np.float32).T[0]
-        token_counts = np.array(for_transform.sum(axis=0), dtype=np.float32)[0]
-
-        result = info_weight_matrix(
-            self._information_function,
-            X,
-            self.model_.transform(for_transform),
-            self.model_.components_,
-            document_lengths,
-            token_counts,
+        # The model has already embedded X while fitting, so reuse that rather than inferring it again
+        return self._transform(
+            X, embedding=np.asarray(self.model_.embedding_, dtype=np.float32)
         )
-        result.eliminate_zeros()
-
-        return result
 
 
-@numba.njit()
+@numba.njit(nogil=True, parallel=True, fastmath=True, boundscheck=False, cache=True)
 def numba_multinomial_em_sparse(
     indptr,
     inds,
@@ -402,62 +671,101 @@ def numba_multinomial_em_sparse(
     low_thresh=1e-5,
     bg_prior=5.0,
     prior_strength=0.3,
+    n_blocks=1,
 ):
     result = np.zeros(data.shape[0], dtype=np.float32)
     mix_weights = np.zeros(indptr.shape[0] - 1, dtype=np.float32)
 
-    prior = np.array([1.0, bg_prior]) * prior_strength
-    mp = 1.0 + 1.0 * np.sum(prior)
-
-    for i in range(indptr.shape[0] - 1):
-        indices = inds[indptr[i] : indptr[i + 1]]
-        row_data = data[indptr[i] : indptr[i + 1]]
-
-        row_background = np.zeros_like(row_data)
-        for idx in range(indices.shape[0]):
-            j = indices[idx]
-            bg_val = 0.0
+    # Keep every scalar in float32 so the row loops stay in single precision
+    # pseudo-counts for the foreground and background; only the foreground one and their total are needed
+    prior = np.float32(prior_strength)
+    mp = np.float32(1.0 + prior_strength * (1.0 + bg_prior))
+    low_thresh = np.float32(low_thresh)
+
+    n_rows = indptr.shape[0] - 1
+    max_row_nnz = 0
+    for i in range(n_rows):
+        max_row_nnz = max(max_row_nnz, indptr[i + 1] - indptr[i])
+
+    # Rows are independent, so split them into n_blocks blocks processed in parallel. Each block allocates its own
+    # scratch buffers sized for the longest row and works on a view of each row's length.
+    n_blocks = min(n_rows, n_blocks)
+    for block in numba.prange(n_blocks):
+        row_background_buffer = np.empty(max_row_nnz, dtype=np.float32)
+        current_dist_buffer = np.empty(max_row_nnz, dtype=np.float32)
+
+        block_start = (block * n_rows) // n_blocks
+        block_end = ((block + 1) * n_rows) // n_blocks
+        for i in range(block_start, block_end):
+            indices = inds[indptr[i] : indptr[i + 1]]
+            row_data = data[indptr[i] : indptr[i + 1]]
+            row_nnz = indices.shape[0]
+
+            # row_background = background_i[i] @ background_j[:, indices], accumulated one topic at a time so the
+            # inner loop runs over the row entries and vectorizes
+            row_background = row_background_buffer[:row_nnz]
+            row_background[:] = 0.0
             for k in range(background_i.shape[1]):
-                bg_val += background_i[i, k] * background_j[k, j]
-            row_background[idx] = bg_val
-
-        row_background = row_background / row_background.sum()
-
-        mix_param = 0.5
-        current_dist = mix_param * row_data + (1.0 - mix_param) * row_background
-
-        last_mix_param = mix_param
-        change_magnitude = 1.0
-
-        while (
-            change_magnitude > precision
-            and mix_param > precision
-            and mix_param < 1.0 - precision
-        ):
-
-            posterior_dist = current_dist * mix_param
-            posterior_dist /= current_dist * mix_param + row_background * (
-                1.0 - mix_param
-            )
-
-            current_dist = posterior_dist * row_data
-            mix_param = (current_dist.sum() + prior[0]) / mp
-            current_dist = current_dist / current_dist.sum()
+                topic_weight = background_i[i, k]
+                topic_row = background_j[k]
+                for idx in range(row_nnz):
+                    row_background[idx] += topic_weight * topic_row[indices[idx]]
+
+            background_sum = np.float32(0.0)
+            for idx in range(row_nnz):
+                background_sum += row_background[idx]
+
+            mix_param = np.float32(0.5)
+            background_weight = np.float32(1.0) - mix_param
+            current_dist = current_dist_buffer[:row_nnz]
+            for idx in range(row_nnz):
+                row_background[idx] /= background_sum
+                current_dist[idx] = (
+                    mix_param * row_data[idx] + background_weight * row_background[idx]
+                )
 
-            change_magnitude = np.abs(mix_param - last_mix_param)
             last_mix_param = mix_param
-
-        # zero out any small values
-        norm = 0.0
-        for n in range(current_dist.shape[0]):
-            if current_dist[n] < low_thresh:
-                current_dist[n] = 0.0
-            else:
-                norm += current_dist[n]
-        current_dist /= norm
-
-        result[indptr[i] : indptr[i + 1]] = current_dist
-        mix_weights[i] = mix_param
+            change_magnitude = np.float32(1.0)
+            # current_dist is kept unnormalized between iterations; dist_norm is its sum, which is folded into the
+            # next E step (and the final thresholding) rather than spending a pass per iteration dividing it out
+            dist_norm = np.float32(1.0)
+
+            while (
+                change_magnitude > precision
+                and mix_param > precision
+                and mix_param < 1.0 - precision
+            ):
+
+                # E and M steps fused into a single in-place pass over the row
+                dist_sum = np.float32(0.0)
+                dist_weight = mix_param / dist_norm
+                background_weight = np.float32(1.0) - mix_param
+                for idx in range(row_nnz):
+                    weighted_dist = current_dist[idx] * dist_weight
+                    posterior = weighted_dist / (
+                        weighted_dist + row_background[idx] * background_weight
+                    )
+                    current_dist[idx] = posterior * row_data[idx]
+                    dist_sum += current_dist[idx]
+
+                mix_param = (dist_sum + prior) / mp
+                dist_norm = dist_sum
+
+                change_magnitude = np.abs(mix_param - last_mix_param)
+                last_mix_param = mix_param
+
+            # zero out any small values (of the normalized distribution)
+            row_thresh = low_thresh * dist_norm
+            norm = np.float32(0.0)
+            for n in range(current_dist.shape[0]):
+                if current_dist[n] < row_thresh:
+                    current_dist[n] = 0.0
+                else:
+                    norm += current_dist[n]
+            current_dist /= norm
+
+            result[indptr[i] : indptr[i + 1]] = current_dist
+            mix_weights[i] = mix_param
 
     return result, mix_weights
 
@@ -475,6 +783,9 @@ def multinomial_em_sparse(
         result = matrix.copy().astype(np.float32)
     else:
         result = matrix.tocsr().astype(np.float32)
+    # A few blocks of rows per thread balances the load. The thread count is read here rather than in the kernel,
+    # as calling numba.get_num_threads there would stop numba caching the compiled kernel.
+    n_blocks = 4 * numba.get_num_threads()
     new_data, mix_weights = numba_multinomial_em_sparse(
         result.indptr,
         result.indices,
@@ -485,6 +796,7 @@ def multinomial_em_sparse(
         low_thresh,
         bg_prior,
         prior_strength,
+        n_blocks,
     )
     result.data = new_data
 
@@ -513,6 +825,10 @@ class RemoveEffectsTransformer(BaseEstimator, TransformerMixin):
         * em_background_prior = 5.0, (a non-negative number)
         * em_prior_strength = 0.3 (a non-negative number)
 
+        n_jobs = None
+            The number of numba threads used by transform. None uses numba's current setting (all cores unless
+            configured otherwise) and -1 means all cores. fit (the pLSA/EnsTop model fit) does not use this.
+
        """
 
     def __init__(
@@ -524,6 +840,7 @@ class RemoveEffectsTransformer(BaseEstimator, TransformerMixin):
         em_threshold=1.0e-8,
         em_prior_strength=0.5,
         normalize=False,
+        n_jobs=None,
     ):
 
         self.n_components = n_components
@@ -533,6 +850,7 @@ class RemoveEffectsTransformer(BaseEstimator, TransformerMixin):
         self.em_precision = em_precision
         self.em_prior_strength = em_prior_strength
         self.normalize = normalize
+        self.n_jobs = n_jobs
 
     def fit(self, X, y=None, **fit_params):
         """
@@ -569,7 +887,7 @@ class RemoveEffectsTransformer(BaseEstimator, TransformerMixin):
         """
 
         X: sparse matrix of shape (n_docs, n_words)
-            The data matrix that has the effects removed
+            The data matrix that has the effects removed.
 
         y: Ignored
 
@@ -584,26 +902,34 @@ class RemoveEffectsTransformer(BaseEstimator, TransformerMixin):
         """
 
         check_is_fitted(self, ["model_"])
+        return self._transform(X)
+
+    def _transform(self, X, embedding=None):
+        # Remove the effects from X given the model embedding of its rows, inferring the embedding if not passed in
         if self.model_type == "enstop" and self.model_.n_components_ == 0:
             if self.normalize:
                 return normalize(X, norm="l1")
             else:
                 return X
-        row_sums = np.array(X.sum(axis=1)).T[0]
-        embedding_ = self.model_.transform(X.astype(np.float32))
-
-        result, weights = multinomial_em_sparse(
-            normalize(X, norm="l1"),
-            embedding_,
-            self.model_.components_,
-            low_thresh=self.em_threshold,
-            bg_prior=self.em_background_prior,
-            precision=self.em_precision,
-            prior_strength=self.em_prior_strength,
-        )
+        row_sums = np.asarray(X.sum(axis=1)).ravel()
+        with _numba_threads(self.n_jobs):
+            if embedding is None:
+                embedding = self.model_.transform(X.astype(np.float32))
+
+            result, weights = multinomial_em_sparse(
+                normalize(X, norm="l1"),
+                embedding,
+                self.model_.components_,
+                low_thresh=self.em_threshold,
+                bg_prior=self.em_background_prior,
+                precision=self.em_precision,
+                prior_strength=self.em_prior_strength,
+            )
         self.mix_weights_ = weights
         if not self.normalize:
-            result = scipy.sparse.diags(row_sums * weights) * result
+            # Scale each row of the csr result directly rather than multiplying by a diagonal matrix
+            row_scale = np.repeat(row_sums * weights, np.diff(result.indptr))
+            result.data = result.data * row_scale
 
         result.eliminate_zeros()
 
@@ -629,7 +955,108 @@ class RemoveEffectsTransformer(BaseEstimator, TransformerMixin):
 
         """
         self.fit(X, **fit_params)
-        return self.transform(X)
+        # The model has already embedded X while fitting, so reuse that rather than inferring it again
+        return self._transform(
+            X, embedding=np.asarray(self.model_.embedding_, dtype=np.float32)
+        )
+
+
+class BigramContracter:
+    """
+    Contracts bigrams of tokens into single tokens joined by the separator.
+
+    This gives the same result as nltk's MWETokenizer when every multi-token expression is a bigram (as is the case
+    for each iteration of the MultiTokenExpressionTransformer), but uses a single left to right pass with set
+    lookups in place of the trie walk.
+
+    Parameters
+    ----------
+    bigrams: iterable of pairs of tokens
+        The bigrams to contract.
+
+    separator: str (default = "_")
+        The string used to join the tokens of a contracted bigram.
+    """
+
+    def __init__(self, bigrams, separator="_"):
+        self.bigrams = set(tuple(bigram) for bigram in bigrams)
+        self.separator = separator
+
+    def tokenize(self, tokens):
+        result = []
+        n_tokens = len(tokens)
+        i = 0
+        while i < n_tokens:
+            if i + 1 < n_tokens and (tokens[i], tokens[i + 1]) in self.bigrams:
+                result.append(tokens[i] + self.separator + tokens[i + 1])
+                i += 2
+            else:
+                result.append(tokens[i])
+                i += 1
+        return result
+
+
+def _contract_batch(contracter, documents):
+    return [tuple(contracter.tokenize(doc)) for doc in documents]
+
+
+def contract_documents(contracter, documents, n_jobs=None, batch_size=1000):
+    """
+    Apply contracter.tokenize to each document, optionally in parallel over batches of documents.
+
+    Parameters
+    ----------
+    contracter: BigramContracter
+        The tokenizer that contracts the multi-token expressions.
+
+    documents: sequence of sequences of tokens
+        The documents to contract.
+
+    n_jobs: int or None (default = None)
+        The number of jobs to run in parallel. None or 1 contracts the documents sequentially and -1 uses all
+        processors.
+
+    batch_size: int (default = 1000)
+        The number of documents sent to a worker per task (to amortize the inter-process communication).
+
+    Returns
+    -------
+    A tuple of tuples of the contracted tokens per document.
+    """
+    if n_jobs is None or n_jobs == 1:
+        return tuple(_contract_batch(contracter, documents))
+
+    batches = Parallel(n_jobs=n_jobs)(
+        delayed(_contract_batch)(contracter, documents[start : start + batch_size])
+        for start in range(0, len(documents), batch_size)
+    )
+    return tuple(doc for batch in batches for doc in batch)
+
+
+def bigram_counts(documents):
+    """
+    Count the tokens and the bigrams of consecutive tokens within each document, as
+    BigramCollocationFinder.from_documents does.
+
+    Returns
+    -------
+    word_fd, bigram_fd: nltk.FreqDist
+        The token counts and the bigram counts.
+    """
+    word_fd = FreqDist()
+    bigram_fd = FreqDist()
+    for doc in documents:
+        word_fd.update(doc)
+        bigram_fd.update(zip(doc[:-1], doc[1:]))
+    return word_fd, bigram_fd
+
+
+def _update_counts(freq_dist, removed, added):
+    freq_dist.subtract(removed)
+    freq_dist.update(added)
+    for key in removed:
+        if freq_dist[key] <= 0:
+            del freq_dist[key]
 
 
 class MultiTokenExpressionTransformer(BaseEstimator, TransformerMixin):
@@ -663,6 +1090,9 @@ class MultiTokenExpressionTransformer(BaseEstimator, TransformerMixin):
     excluded_token_regex = str (default = r\"\W+\")
         Do not contract bigrams when either of the tokens fully matches the regular expression via re.fullmatch
 
+    n_jobs = int (default = None)
+        The number of jobs used to contract the documents in parallel. None means 1 and -1 means all processors.
+
     """
 
     def __init__(
@@ -677,6 +1107,7 @@ class MultiTokenExpressionTransformer(BaseEstimator, TransformerMixin):
         min_ngram_occurrences=None,
         ignored_tokens=None,
         excluded_token_regex=r"\W+",
+        n_jobs=None,
     ):
 
         self.score_function = score_function
@@ -689,7 +1120,9 @@ class MultiTokenExpressionTransformer(BaseEstimator, TransformerMixin):
         self.min_ngram_occurrences = min_ngram_occurrences
         self.ignored_tokens = ignored_tokens
         self.excluded_token_regex = excluded_token_regex
+        self.n_jobs = n_jobs
         self.mtes_ = list([])
+        self.contracters_ = list([])
 
     def fit(self, X, **fit_params):
         """
@@ -697,10 +1130,14 @@ class MultiTokenExpressionTransformer(BaseEstimator, TransformerMixin):
         that score higher on the collocation_function than the min_collocation_score (and satisfy other
         criteria set out by the optional parameters).
         """
+        self.mtes_ = list([])
+        self.contracters_ = list([])
         self.tokenization_ = X
         n_tokens = sum([len(x) for x in X])
+        # The counts are built once and then updated for the documents changed by each contraction
+        word_fd, bigram_fd = bigram_counts(self.tokenization_)
         for i in range(self.max_iterations):
-            bigramer = BigramCollocationFinder.from_documents(self.tokenization_)
+            bigramer = BigramCollocationFinder(word_fd, bigram_fd)
 
             if not self.ignored_tokens == None:
                 ignore_fn = lambda w: w in self.ignored_tokens
@@ -742,11 +1179,31 @@ class MultiTokenExpressionTransformer(BaseEstimator, TransformerMixin):
 
             self.mtes_.append(new_grams)
 
-            contracter = MWETokenizer(new_grams)
-            self.tokenization_ = tuple(
-                [tuple(contracter.tokenize(doc)) for doc in self.tokenization_]
+            contracter = BigramContracter(new_grams)
+            self.contracters_.append(contracter)
+            contracted = contract_documents(
+                contracter, self.tokenization_, n_jobs=self.n_jobs
             )
 
+            # The counts are only needed by the next iteration. A contraction always shortens a document, so only
+            # those need recounting
+            if i < self.max_iterations - 1:
+                changed = [
+                    idx
+                    for idx in range(len(contracted))
+                    if len(contracted[idx]) != len(self.tokenization_[idx])
+                ]
+                old_word_fd, old_bigram_fd = bigram_counts(
+                    self.tokenization_[idx] for idx in changed
+                )
+                new_word_fd, new_bigram_fd = bigram_counts(
+                    contracted[idx] for idx in changed
+                )
+                _update_counts(word_fd, old_word_fd, new_word_fd)
+                _update_counts(bigram_fd, old_bigram_fd, new_bigram_fd)
+
+            self.tokenization_ = contracted
+
         return self
 
     def fit_transform(self, X, y=None, **fit_params):
@@ -755,7 +1212,10 @@ class MultiTokenExpressionTransformer(BaseEstimator, TransformerMixin):
 
     def transform(self, X, y=None):
         result = X
-        for i in range(len(self.mtes_)):
-            contracter = MWETokenizer(self.mtes_[i])
-            result = tuple([tuple(contracter.tokenize(doc)) for doc in result])
+        # Transformers pickled before the contracters were kept only have the mtes_
+        contracters = getattr(self, "contracters_", None)
+        if contracters is None:
+            contracters = [BigramContracter(grams) for grams in self.mtes_]
+        for contracter in contracters:
+            result = contract_documents(contracter, result, n_jobs=self.n_jobs)
         return result